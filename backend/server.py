@@ -1,23 +1,32 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Request, Depends, status
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Request, Depends, Query, status
+from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from cachetools import TTLCache
 import os
+import asyncio
 import logging
 from pathlib import Path
+from collections import Counter
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, BinaryIO, Tuple
 import uuid
 from datetime import datetime, timedelta
-import aiofiles
+import aiofiles.os
 import secrets
 import mimetypes
-import hashlib
+from contextlib import asynccontextmanager
+from blake3 import blake3
 from urllib.parse import quote
 import jwt
-from passlib.context import CryptContext
+import hmac
+import base64
+import time
+import orjson
 import bcrypt
 
 ROOT_DIR = Path(__file__).parent
@@ -31,6 +40,26 @@ db = client[os.environ['DB_NAME']]
 # Create uploads directory
 UPLOAD_DIR = ROOT_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+# Fields needed to serve a file or its public info by download token
+FILE_INFO_PROJECTION = {
+    "stored_filename": 1, "original_filename": 1, "file_size": 1,
+    "mime_type": 1, "upload_date": 1, "download_count": 1, "_id": 0
+}
+
+# Locks serialising linking and unlinking of each stored file across all workers,
+# held as documents in db.stored_file_locks keyed by stored filename
+STORED_FILE_LOCK_TIMEOUT = 30  # seconds before a lock left by a crashed worker can be taken over
+STORED_FILE_LOCK_RETRY_INTERVAL = 0.05  # seconds
+
+# Authenticated users, keyed by user id
+user_cache = TTLCache(maxsize=10_000, ttl=60)
+
+# Download counts are buffered in memory and flushed to MongoDB in batches
+DOWNLOAD_COUNT_FLUSH_INTERVAL = 1  # seconds
+pending_download_counts: Counter = Counter()
+download_count_flusher: Optional[asyncio.Task] = None
 
 # JWT and Password settings
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'novusfiles-secret-key-change-in-production')
@@ -39,11 +68,12 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 LONG_TOKEN_EXPIRE_DAYS = 30
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+BCRYPT_MAX_PASSWORD_BYTES = 72  # bcrypt only uses this many bytes; bcrypt>=5 raises on longer input
 security = HTTPBearer(auto_error=False)
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -118,13 +148,17 @@ class StatusCheckCreate(BaseModel):
     client_name: str
 
 # Utility functions
+def bcrypt_password_bytes(password: str) -> bytes:
+    """Encode a password, truncated to the bytes bcrypt uses (as passlib and bcrypt<5 did implicitly)"""
+    return password.encode()[:BCRYPT_MAX_PASSWORD_BYTES]
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return bcrypt.checkpw(bcrypt_password_bytes(plain_password), hashed_password.encode())
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(bcrypt_password_bytes(password), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT token"""
@@ -137,6 +171,37 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def decode_access_token(token: str) -> dict:
+    """Verify and decode an HS256 JWT created by create_access_token"""
+    try:
+        signing_input, _, signature_segment = token.rpartition(".")
+        header_segment, payload_segment = signing_input.split(".")
+        header = orjson.loads(base64url_decode(header_segment))
+        payload = orjson.loads(base64url_decode(payload_segment))
+        signature = base64url_decode(signature_segment)
+    except ValueError:
+        raise jwt.DecodeError("Invalid token")
+    if not isinstance(header, dict) or not isinstance(payload, dict):
+        raise jwt.DecodeError("Invalid token")
+    if header.get("alg") != ALGORITHM:
+        raise jwt.InvalidAlgorithmError("The specified alg value is not allowed")
+    
+    expected_signature = hmac.new(SECRET_KEY.encode(), signing_input.encode(), "sha256").digest()
+    if not hmac.compare_digest(expected_signature, signature):
+        raise jwt.InvalidSignatureError("Signature verification failed")
+    
+    exp = payload.get("exp")
+    if exp is not None:
+        if not isinstance(exp, int):
+            raise jwt.DecodeError("Expiration Time claim (exp) must be an integer.")
+        if exp <= time.time():
+            raise jwt.ExpiredSignatureError("Signature has expired")
+    return payload
+
+def base64url_decode(segment: str) -> bytes:
+    """Decode an unpadded base64url JWT segment"""
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current user from JWT token"""
     if credentials is None:
@@ -147,7 +212,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         )
     
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(credentials.credentials)
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(
@@ -162,27 +227,116 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = await db.users.find_one({"id": user_id})
+    user = user_cache.get(user_id)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        user_doc = await db.users.find_one({"id": user_id}, projection={"_id": 0})
+        if user_doc is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        user = User(**user_doc)
+        user_cache[user_id] = user
     
-    return User(**user)
+    return user
+
+async def find_file_by_token(token: str) -> Optional[dict]:
+    """Find public file metadata by download token
+    
+    Not cached: a download link must stop working as soon as its file is deleted,
+    whichever worker handled the delete.
+    """
+    return await db.files.find_one({"download_token": token}, projection=FILE_INFO_PROJECTION)
+
+async def flush_download_counts():
+    """Write buffered download counts to MongoDB in one bulk write"""
+    if not pending_download_counts:
+        return
+    counts = pending_download_counts.copy()
+    pending_download_counts.clear()
+    tokens = list(counts)
+    try:
+        await db.files.bulk_write(
+            [UpdateOne({"download_token": token}, {"$inc": {"download_count": counts[token]}}) for token in tokens],
+            ordered=False
+        )
+    except BulkWriteError as e:
+        # Unordered: every update not listed as failed was applied, so only retry the failed ones
+        logger.error(f"Download count flush error: {str(e)}")
+        for error in e.details.get("writeErrors", []):
+            token = tokens[error["index"]]
+            pending_download_counts[token] += counts[token]
+    except asyncio.CancelledError:
+        # The write may have landed before the cancel; retrying risks double counting
+        # rather than losing the counts outright
+        pending_download_counts.update(counts)
+        raise
+    except Exception as e:
+        # Same trade-off: a timeout or dropped connection does not tell us whether it was applied
+        logger.error(f"Download count flush error: {str(e)}")
+        pending_download_counts.update(counts)
+
+async def flush_download_counts_periodically():
+    """Flush buffered download counts until cancelled"""
+    while True:
+        await asyncio.sleep(DOWNLOAD_COUNT_FLUSH_INTERVAL)
+        await flush_download_counts()
 
 def generate_download_token():
     """Generate a secure random token for download links"""
     return secrets.token_urlsafe(32)
 
-def get_file_hash(file_path: Path) -> str:
-    """Generate SHA256 hash of file for integrity checking"""
-    hash_sha256 = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_sha256.update(chunk)
-    return hash_sha256.hexdigest()
+def get_download_prefix(request: Request) -> str:
+    """Build the absolute download URL prefix straight from the ASGI scope"""
+    host = request.headers.get("host")
+    if host is None:
+        return f"{str(request.base_url).rstrip('/')}/api/download/"
+    return f"{request.scope['scheme']}://{host}{request.scope.get('root_path', '')}/api/download/"
+
+def save_upload(source: BinaryIO, destination: Path) -> Tuple[int, str]:
+    """Copy an upload to disk in chunks, returning its size and BLAKE3 hash"""
+    hasher = blake3(max_threads=blake3.AUTO)
+    file_size = 0
+    with open(destination, "wb") as f:
+        while chunk := source.read(UPLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+            f.write(chunk)
+            file_size += len(chunk)
+    return file_size, hasher.hexdigest()
+
+def link_upload(temp_path: Path, stored_filename: str):
+    """Link a saved upload to its content-addressed path
+    
+    Identical uploads share a single file at UPLOAD_DIR/<hash[:2]>/<hash>.
+    """
+    file_path = UPLOAD_DIR / stored_filename
+    file_path.parent.mkdir(exist_ok=True)
+    try:
+        os.link(temp_path, file_path)
+    except FileExistsError:
+        pass  # Same content is already stored
+
+@asynccontextmanager
+async def stored_file_lock(stored_filename: str):
+    """Hold the lock on a stored file while linking it to a new record or removing it"""
+    owner = secrets.token_hex(16)
+    while True:
+        try:
+            await db.stored_file_locks.insert_one({
+                "_id": stored_filename,
+                "owner": owner,
+                "expires_at": datetime.utcnow() + timedelta(seconds=STORED_FILE_LOCK_TIMEOUT)
+            })
+            break
+        except DuplicateKeyError:
+            # Held by another request; take it over only if its holder died without releasing it
+            await db.stored_file_locks.delete_one({"_id": stored_filename, "expires_at": {"$lt": datetime.utcnow()}})
+            await asyncio.sleep(STORED_FILE_LOCK_RETRY_INTERVAL)
+    try:
+        yield
+    finally:
+        await db.stored_file_locks.delete_one({"_id": stored_filename, "owner": owner})
 
 def format_file_size(size_bytes: int) -> str:
     """Convert bytes to human readable format"""
@@ -201,7 +355,7 @@ async def register_user(user_data: UserCreate):
     """Register a new user"""
     try:
         # Check if username already exists
-        existing_user = await db.users.find_one({"username": user_data.username})
+        existing_user = await db.users.find_one({"username": user_data.username}, projection={"_id": 1})
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -209,14 +363,20 @@ async def register_user(user_data: UserCreate):
             )
         
         # Create user
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await asyncio.to_thread(get_password_hash, user_data.password)
         user = User(
             username=user_data.username,
             password_hash=hashed_password
         )
         
-        # Save to database
-        await db.users.insert_one(user.dict())
+        # Save to database; the unique username index catches a concurrent registration
+        try:
+            await db.users.insert_one(user.dict())
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Username already registered"
+            )
         
         logger.info(f"New user registered: {user_data.username}")
         
@@ -237,7 +397,7 @@ async def login_user(user_data: UserLogin):
     """Login user and return JWT token"""
     try:
         # Find user
-        user_doc = await db.users.find_one({"username": user_data.username})
+        user_doc = await db.users.find_one({"username": user_data.username}, projection={"_id": 0})
         if not user_doc:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -247,7 +407,7 @@ async def login_user(user_data: UserLogin):
         user = User(**user_doc)
         
         # Verify password
-        if not verify_password(user_data.password, user.password_hash):
+        if not await asyncio.to_thread(verify_password, user_data.password, user.password_hash):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid username or password"
@@ -310,45 +470,42 @@ async def upload_file(
         if not file.filename:
             raise HTTPException(status_code=400, detail="No file provided")
         
-        # Generate unique stored filename
-        file_extension = Path(file.filename).suffix
-        stored_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = UPLOAD_DIR / stored_filename
-        
-        # Get file content and size
-        file_content = await file.read()
-        file_size = len(file_content)
-        
         # Detect MIME type
         mime_type = mimetypes.guess_type(file.filename)[0] or "application/octet-stream"
         
-        # Save file to disk
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(file_content)
-        
-        # Generate file hash
-        file_hash = get_file_hash(file_path)
-        
-        # Generate download token
-        download_token = generate_download_token()
-        
-        # Create file metadata (associated with current user)
-        file_metadata = FileMetadata(
-            user_id=current_user.id,
-            original_filename=file.filename,
-            stored_filename=stored_filename,
-            file_size=file_size,
-            mime_type=mime_type,
-            download_token=download_token,
-            file_hash=file_hash
-        )
-        
-        # Save to database
-        await db.files.insert_one(file_metadata.dict())
+        # Save file to a temporary path, hashing it in the same pass
+        temp_path = UPLOAD_DIR / f".upload-{secrets.token_hex(16)}"
+        try:
+            file_size, file_hash = await asyncio.to_thread(save_upload, file.file, temp_path)
+            stored_filename = f"{file_hash[:2]}/{file_hash}"
+            
+            # Generate download token
+            download_token = generate_download_token()
+            
+            # Create file metadata (associated with current user)
+            file_metadata = FileMetadata(
+                user_id=current_user.id,
+                original_filename=file.filename,
+                stored_filename=stored_filename,
+                file_size=file_size,
+                mime_type=mime_type,
+                download_token=download_token,
+                file_hash=file_hash
+            )
+            
+            # Move into content-addressed storage and save to database; holding the
+            # lock keeps a concurrent delete of the same content from removing the file in between
+            async with stored_file_lock(stored_filename):
+                await asyncio.to_thread(link_upload, temp_path, stored_filename)
+                await db.files.insert_one(file_metadata.dict())
+        finally:
+            try:
+                await aiofiles.os.remove(temp_path)
+            except FileNotFoundError:
+                pass
         
         # Generate download link
-        base_url = str(request.base_url).rstrip('/')
-        download_link = f"{base_url}/api/download/{download_token}"
+        download_link = get_download_prefix(request) + download_token
         
         logger.info(f"File uploaded by {current_user.username}: {file.filename} ({format_file_size(file_size)})")
         
@@ -373,30 +530,27 @@ async def download_file(token: str):
     """Download file using secure token (no auth required for downloads)"""
     try:
         # Find file by download token
-        file_doc = await db.files.find_one({"download_token": token})
+        file_doc = await find_file_by_token(token)
         if not file_doc:
             raise HTTPException(status_code=404, detail="File not found")
         
-        file_metadata = FileMetadata(**file_doc)
-        file_path = UPLOAD_DIR / file_metadata.stored_filename
+        original_filename = file_doc["original_filename"]
+        file_path = UPLOAD_DIR / file_doc["stored_filename"]
         
         # Check if file exists on disk
-        if not file_path.exists():
+        if not await aiofiles.os.path.exists(file_path):
             raise HTTPException(status_code=404, detail="File no longer available")
         
-        # Increment download count
-        await db.files.update_one(
-            {"download_token": token},
-            {"$inc": {"download_count": 1}}
-        )
+        # Increment download count (persisted by the background flusher)
+        pending_download_counts[token] += 1
         
         # Return file with proper headers
         return FileResponse(
             path=str(file_path),
-            filename=file_metadata.original_filename,
-            media_type=file_metadata.mime_type,
+            filename=original_filename,
+            media_type=file_doc["mime_type"],
             headers={
-                "Content-Disposition": f"attachment; filename*=UTF-8''{quote(file_metadata.original_filename)}",
+                "Content-Disposition": f"attachment; filename*=UTF-8''{quote(original_filename)}",
                 "X-Content-Type-Options": "nosniff",
                 "Cache-Control": "no-cache"
             }
@@ -411,32 +565,27 @@ async def download_file(token: str):
 @api_router.get("/files", response_model=List[FileInfo])
 async def list_files(
     request: Request, 
-    limit: int = 50,
+    limit: int = Query(50, ge=1),
     current_user: User = Depends(get_current_user)
 ):
     """List files for current user only"""
     try:
-        files_cursor = db.files.find({"user_id": current_user.id}).sort("upload_date", -1).limit(limit)
-        files_list = await files_cursor.to_list(length=limit)
-        
-        base_url = str(request.base_url).rstrip('/')
-        result = []
-        
-        for file_doc in files_list:
-            file_metadata = FileMetadata(**file_doc)
-            download_link = f"{base_url}/api/download/{file_metadata.download_token}"
-            
-            result.append(FileInfo(
-                id=file_metadata.id,
-                original_filename=file_metadata.original_filename,
-                file_size=file_metadata.file_size,
-                mime_type=file_metadata.mime_type,
-                upload_date=file_metadata.upload_date,
-                download_count=file_metadata.download_count,
-                download_link=download_link
-            ))
-        
-        return result
+        # Let MongoDB shape each document into a FileInfo, download link included
+        pipeline = [
+            {"$match": {"user_id": current_user.id}},
+            {"$sort": {"upload_date": -1}},
+            {"$limit": limit},
+            {"$project": {
+                "_id": 0, "id": 1, "original_filename": 1, "file_size": 1,
+                "mime_type": 1, "upload_date": 1, "download_count": 1, "download_token": 1,
+                "download_link": {"$concat": [get_download_prefix(request), "$download_token"]}
+            }}
+        ]
+        files = await db.files.aggregate(pipeline).to_list(length=limit)
+        # Include downloads still buffered for the next flush
+        for file_doc in files:
+            file_doc["download_count"] += pending_download_counts.get(file_doc.pop("download_token"), 0)
+        return files
         
     except Exception as e:
         logger.error(f"List files error: {str(e)}")
@@ -447,21 +596,27 @@ async def delete_file(file_id: str, current_user: User = Depends(get_current_use
     """Delete a file (only owner can delete)"""
     try:
         # Find file by ID and user_id
-        file_doc = await db.files.find_one({"id": file_id, "user_id": current_user.id})
+        file_doc = await db.files.find_one(
+            {"id": file_id, "user_id": current_user.id},
+            projection={"stored_filename": 1, "original_filename": 1, "_id": 0}
+        )
         if not file_doc:
             raise HTTPException(status_code=404, detail="File not found")
         
-        file_metadata = FileMetadata(**file_doc)
-        file_path = UPLOAD_DIR / file_metadata.stored_filename
-        
-        # Delete from database
-        await db.files.delete_one({"id": file_id, "user_id": current_user.id})
+        file_path = UPLOAD_DIR / file_doc["stored_filename"]
         
-        # Delete from disk if exists
-        if file_path.exists():
-            file_path.unlink()
-        
-        logger.info(f"File deleted by {current_user.username}: {file_metadata.original_filename}")
+        async with stored_file_lock(file_doc["stored_filename"]):
+            # Delete from database
+            await db.files.delete_one({"id": file_id, "user_id": current_user.id})
+            
+            # Delete from disk once no other upload shares the stored content
+            if not await db.files.count_documents({"stored_filename": file_doc["stored_filename"]}, limit=1):
+                try:
+                    await aiofiles.os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+        
+        logger.info(f"File deleted by {current_user.username}: {file_doc['original_filename']}")
         return {"message": "File deleted successfully"}
         
     except HTTPException:
@@ -474,19 +629,17 @@ async def delete_file(file_id: str, current_user: User = Depends(get_current_use
 async def get_file_info(token: str):
     """Get file information without downloading (public endpoint)"""
     try:
-        file_doc = await db.files.find_one({"download_token": token})
+        file_doc = await find_file_by_token(token)
         if not file_doc:
             raise HTTPException(status_code=404, detail="File not found")
         
-        file_metadata = FileMetadata(**file_doc)
-        
         return {
-            "filename": file_metadata.original_filename,
-            "size": file_metadata.file_size,
-            "size_formatted": format_file_size(file_metadata.file_size),
-            "type": file_metadata.mime_type,
-            "upload_date": file_metadata.upload_date,
-            "download_count": file_metadata.download_count
+            "filename": file_doc["original_filename"],
+            "size": file_doc["file_size"],
+            "size_formatted": format_file_size(file_doc["file_size"]),
+            "type": file_doc["mime_type"],
+            "upload_date": file_doc["upload_date"],
+            "download_count": file_doc["download_count"] + pending_download_counts.get(token, 0)
         }
         
     except HTTPException:
@@ -519,6 +672,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def create_db_indexes():
+    await db.users.create_index("id", unique=True)
+    try:
+        await db.users.create_index("username", unique=True)
+    except OperationFailure as e:
+        # Fails while existing users share a username; keep serving and let an admin deduplicate
+        logger.error(f"Could not create unique username index, deduplicate users.username: {str(e)}")
+    await db.files.create_index("id", unique=True)
+    await db.files.create_index("download_token", unique=True)
+    await db.files.create_index("stored_filename")
+    # Covers list_files: equality on user_id, sorted by newest upload
+    await db.files.create_index([("user_id", 1), ("upload_date", -1)])
+
+@app.on_event("startup")
+async def start_download_count_flusher():
+    global download_count_flusher
+    download_count_flusher = asyncio.create_task(flush_download_counts_periodically())
+
+@app.on_event("shutdown")
+async def stop_download_count_flusher():
+    if download_count_flusher is not None:
+        download_count_flusher.cancel()
+        try:
+            await download_count_flusher
+        except asyncio.CancelledError:
+            pass
+    await flush_download_counts()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
\ No newline at end of file
@@ -4,66 +4,197 @@ Backend API Testing Suite for NovusFiles - Secure File Sharing with Authenticati
 Tests authentication system, private file sharing, and security features.
 """
 
+import orjson
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+import io
+import itertools
 import os
-import tempfile
+import sys
 import hashlib
-from pathlib import Path
 import time
-from typing import Dict, Any, List
-import uuid
+import threading
+import types
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Any, List, Callable, Mapping
 
 # Get backend URL from frontend environment
 BACKEND_URL = "https://c5f5d054-b659-44cd-80a2-ac7fa6712e10.preview.emergentagent.com/api"
+CHUNK_SIZE = 64 * 1024  # Streaming read size for upload payloads and downloads
+
+# Fields each response type must contain
+USER_FIELDS = frozenset({'id', 'username', 'created_at'})
+TOKEN_FIELDS = frozenset({'access_token', 'token_type', 'expires_in', 'user'})
+UPLOAD_FIELDS = frozenset({'id', 'original_filename', 'file_size', 'mime_type', 'upload_date', 'download_count', 'download_link'})
+MAX_CONCURRENT_REQUESTS = 5  # Keep parallel tests from tripping the backend's rate limits
+REQUEST_TIMEOUT = (3, 10)  # (connect, read) seconds
+RESULT_CATEGORIES = ("authentication", "private_files", "security", "user_isolation", "token_management")
+USER_PREFIX = f"{os.getpid():x}{int(time.time()):x}"  # Distinct per process, so usernames never collide across runs
+user_counter = itertools.count()
+
+def unique_username(prefix: str) -> str:
+    """Username that is unique to this run"""
+    return f"{prefix}_{USER_PREFIX}_{next(user_counter)}"
+
+# Which test steps each step needs to have finished first; steps whose needs are met run concurrently
+TEST_DEPENDENCIES = {
+    "register": [],
+    "login": ["register"],
+    "me": ["login"],
+    "upload": ["login"],
+    "password": ["login"],
+    "second_user": ["register"],  # Only so the first user stays test_users[0]
+    "isolation": ["upload", "second_user"],
+    "download": ["upload"]
+}
+
+def get_download_token(download_link: str) -> str:
+    """Extract the download token from the end of a download link"""
+    return download_link.rsplit('/', 1)[-1]
+
+def parse_json(response: requests.Response) -> Any:
+    """Decode a JSON response body with orjson"""
+    return orjson.loads(response.content)
+
+class ApiSession(requests.Session):
+    """requests.Session that applies REQUEST_TIMEOUT unless a call sets its own and encodes json= bodies with orjson"""
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        if kwargs.get("json") is not None:
+            kwargs["data"] = orjson.dumps(kwargs.pop("json"))
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "Content-Type": "application/json"}
+        return super().request(method, url, **kwargs)
+
+class ApiRetry(Retry):
+    """Retry that resends POSTs only on 429, when the backend is known not to have acted on them"""
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if method == "POST" and status_code == 429:
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
+def build_urls(base_url: str) -> Dict[str, str]:
+    """Build endpoint URLs once; per-file and per-token ones are str.format templates"""
+    return {
+        'root': f"{base_url}/",
+        'register': f"{base_url}/auth/register",
+        'login': f"{base_url}/auth/login",
+        'me': f"{base_url}/auth/me",
+        'upload': f"{base_url}/upload",
+        'files': f"{base_url}/files",
+        'file': f"{base_url}/files/{{}}",
+        'download': f"{base_url}/download/{{}}"
+    }
+
+def create_session() -> requests.Session:
+    """Create the keep-alive session shared by all test requests"""
+    # Reuse keep-alive connections across all requests instead of a new TLS handshake each.
+    # A blocking pool also caps requests in flight, however many threads are running tests.
+    session = ApiSession()
+    adapter = HTTPAdapter(
+        pool_connections=50,
+        pool_maxsize=MAX_CONCURRENT_REQUESTS,
+        pool_block=True,
+        # 5xx and read errors are only retried for idempotent methods: a register or upload may
+        # already have gone through. Connect errors are retried for every method, as nothing was sent.
+        max_retries=ApiRetry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=[429, 502, 503, 504],
+            allowed_methods=frozenset({"GET", "DELETE"})
+        )
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
 class NovusFilesTester:
     def __init__(self):
         self.base_url = BACKEND_URL
+        self.urls = build_urls(self.base_url)
         self.test_users = []  # Track test users for cleanup
-        self.user_tokens = {}  # Store user tokens
-        self.uploaded_files = {}  # Track uploaded files per user
-        self.test_results = {
-            "authentication": {"passed": 0, "failed": 0, "errors": []},
-            "private_files": {"passed": 0, "failed": 0, "errors": []},
-            "security": {"passed": 0, "failed": 0, "errors": []},
-            "user_isolation": {"passed": 0, "failed": 0, "errors": []},
-            "token_management": {"passed": 0, "failed": 0, "errors": []}
-        }
+        self.auth_headers = {}  # Read-only Authorization headers per username, shared across threads
+        self.uploaded_files = {}  # Track uploaded files per user, keyed by file id
+        self.upload_digests = {}  # SHA-256 of each uploaded file's content, by file id
+        self.second_user = None  # Logged-in helper user for the isolation tests
+        self.result_counts = Counter()  # Keyed by (category, "passed" | "failed")
+        self.result_errors = defaultdict(list)  # Failure messages per category
+        self.session = create_session()
+        self.results_lock = threading.Lock()
+        self.log_buffer = []  # Test output, written out between test phases
     
     def log_result(self, category: str, test_name: str, success: bool, error_msg: str = ""):
         """Log test results"""
-        if success:
-            self.test_results[category]["passed"] += 1
-            print(f"✅ {test_name}")
-        else:
-            self.test_results[category]["failed"] += 1
-            self.test_results[category]["errors"].append(f"{test_name}: {error_msg}")
-            print(f"❌ {test_name}: {error_msg}")
+        with self.results_lock:
+            self.result_counts[(category, "passed" if success else "failed")] += 1
+            if success:
+                self.log(f"✅ {test_name}")
+            else:
+                self.result_errors[category].append((test_name, error_msg))
+                self.log(f"❌ {test_name}: {error_msg}")
+    
+    def log(self, message: str):
+        """Buffer a line of test output until the next flush_log()"""
+        self.log_buffer.append(message)
+    
+    def flush_log(self):
+        """Write all buffered test output in a single call"""
+        with self.results_lock:
+            lines, self.log_buffer = self.log_buffer, []
+        if lines:
+            sys.stdout.write('\n'.join(lines) + '\n')
+            sys.stdout.flush()
     
-    def create_test_file(self, filename: str, content: str) -> str:
-        """Create a temporary test file"""
-        temp_dir = tempfile.gettempdir()
-        file_path = os.path.join(temp_dir, filename)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        return file_path
+    def run_concurrently(self, *calls: Callable[[], Any]) -> List[Any]:
+        """Run independent calls in parallel threads and return their results in order"""
+        with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+            futures = [executor.submit(call) for call in calls]
+            return [future.result() for future in futures]
     
-    def create_binary_test_file(self, filename: str, size_kb: int = 1) -> str:
-        """Create a binary test file"""
-        temp_dir = tempfile.gettempdir()
-        file_path = os.path.join(temp_dir, filename)
-        with open(file_path, 'wb') as f:
-            f.write(b'A' * (size_kb * 1024))
-        return file_path
+    def run_dependency_graph(self, tasks: Dict[str, Callable[[], Any]], dependencies: Dict[str, List[str]]):
+        """Run each task as soon as everything it depends on has finished"""
+        remaining = dict(dependencies)
+        running = {}
+        done = set()
+        with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            while remaining or running:
+                for name in [name for name, needs in remaining.items() if done.issuperset(needs)]:
+                    del remaining[name]
+                    running[executor.submit(tasks[name])] = name
+                if not running:
+                    raise ValueError(f"Unsatisfiable test dependencies: {sorted(remaining)}")
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done.add(running.pop(future))
+                    future.result()
+                self.flush_log()
+    
+    def store_token(self, username: str, token: str):
+        """Build a user's Authorization headers once, when their token is issued"""
+        self.auth_headers[username] = types.MappingProxyType({"Authorization": f"Bearer {token}"})
+    
+    def hash_upload(self, f) -> str:
+        """SHA-256 of an upload payload, rewinding it so it can still be sent"""
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+        f.seek(0)
+        return digest.hexdigest()
+    
+    def make_payload(self, filename: str, content, mime_type: str = 'text/plain') -> tuple:
+        """Build an in-memory upload payload for requests' files= argument"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return (filename, io.BytesIO(content), mime_type)
     
     def test_api_root(self):
         """Test API root endpoint"""
-        print("\n🔍 Testing API Root Endpoint...")
+        self.log("\n🔍 Testing API Root Endpoint...")
         try:
-            response = requests.get(f"{self.base_url}/")
+            response = self.session.get(self.urls['root'])
             if response.status_code == 200:
-                data = response.json()
+                data = parse_json(response)
                 if "message" in data and "NovusFiles" in data["message"]:
                     self.log_result("authentication", "API Root Endpoint", True)
                     return True
@@ -77,10 +208,10 @@ class NovusFilesTester:
     
     def test_user_registration(self):
         """Test user registration functionality"""
-        print("\n👤 Testing User Registration...")
+        self.log("\n👤 Testing User Registration...")
         
         # Test 1: Register valid user
-        test_username = f"testuser_{uuid.uuid4().hex[:8]}"
+        test_username = unique_username("testuser")
         test_password = "SecurePassword123!"
         
         try:
@@ -88,20 +219,20 @@ class NovusFilesTester:
                 "username": test_username,
                 "password": test_password
             }
-            response = requests.post(f"{self.base_url}/auth/register", json=registration_data)
+            response = self.session.post(self.urls['register'], json=registration_data)
             
             if response.status_code == 200:
-                data = response.json()
-                required_fields = ['id', 'username', 'created_at']
+                data = parse_json(response)
+                missing_fields = USER_FIELDS - data.keys()
                 
-                if all(field in data for field in required_fields):
+                if not missing_fields:
                     if data['username'] == test_username:
                         self.test_users.append({"username": test_username, "password": test_password, "id": data['id']})
                         self.log_result("authentication", "User Registration", True)
                     else:
                         self.log_result("authentication", "User Registration", False, "Username mismatch in response")
                 else:
-                    self.log_result("authentication", "User Registration", False, "Missing required fields in response")
+                    self.log_result("authentication", "User Registration", False, f"Missing required fields in response: {sorted(missing_fields)}")
             else:
                 self.log_result("authentication", "User Registration", False, f"Status code: {response.status_code}, Response: {response.text}")
         except Exception as e:
@@ -113,7 +244,7 @@ class NovusFilesTester:
                 "username": test_username,
                 "password": "AnotherPassword123!"
             }
-            response = requests.post(f"{self.base_url}/auth/register", json=duplicate_data)
+            response = self.session.post(self.urls['register'], json=duplicate_data)
             
             if response.status_code == 400:
                 self.log_result("authentication", "Duplicate Username Prevention", True)
@@ -128,7 +259,7 @@ class NovusFilesTester:
                 "username": "",
                 "password": "short"
             }
-            response = requests.post(f"{self.base_url}/auth/register", json=invalid_data)
+            response = self.session.post(self.urls['register'], json=invalid_data)
             
             if response.status_code in [400, 422]:
                 self.log_result("authentication", "Registration Input Validation", True)
@@ -139,7 +270,7 @@ class NovusFilesTester:
     
     def test_user_login(self):
         """Test user login functionality"""
-        print("\n🔐 Testing User Login...")
+        self.log("\n🔐 Testing User Login...")
         
         if not self.test_users:
             self.log_result("authentication", "Login Test Setup", False, "No test users available")
@@ -154,25 +285,25 @@ class NovusFilesTester:
                 "password": test_user["password"],
                 "stay_logged_in": False
             }
-            response = requests.post(f"{self.base_url}/auth/login", json=login_data)
+            response = self.session.post(self.urls['login'], json=login_data)
             
             if response.status_code == 200:
-                data = response.json()
-                required_fields = ['access_token', 'token_type', 'expires_in', 'user']
+                data = parse_json(response)
+                missing_fields = TOKEN_FIELDS - data.keys()
                 
-                if all(field in data for field in required_fields):
+                if not missing_fields:
                     # Check token type
                     if data['token_type'] == 'bearer':
                         # Check expiration (should be 30 minutes = 1800 seconds)
                         if data['expires_in'] == 1800:
-                            self.user_tokens[test_user["username"]] = data['access_token']
+                            self.store_token(test_user["username"], data['access_token'])
                             self.log_result("authentication", "Login Short-term Token", True)
                         else:
                             self.log_result("authentication", "Login Short-term Token", False, f"Expected 1800s expiry, got: {data['expires_in']}")
                     else:
                         self.log_result("authentication", "Login Short-term Token", False, f"Expected bearer token, got: {data['token_type']}")
                 else:
-                    self.log_result("authentication", "Login Short-term Token", False, "Missing required fields in response")
+                    self.log_result("authentication", "Login Short-term Token", False, f"Missing required fields in response: {sorted(missing_fields)}")
             else:
                 self.log_result("authentication", "Login Short-term Token", False, f"Status code: {response.status_code}, Response: {response.text}")
         except Exception as e:
@@ -185,10 +316,10 @@ class NovusFilesTester:
                 "password": test_user["password"],
                 "stay_logged_in": True
             }
-            response = requests.post(f"{self.base_url}/auth/login", json=login_data)
+            response = self.session.post(self.urls['login'], json=login_data)
             
             if response.status_code == 200:
-                data = response.json()
+                data = parse_json(response)
                 # Check expiration (should be 30 days = 2592000 seconds)
                 if data['expires_in'] == 2592000:
                     self.log_result("authentication", "Login Long-term Token", True)
@@ -199,69 +330,52 @@ class NovusFilesTester:
         except Exception as e:
             self.log_result("authentication", "Login Long-term Token", False, str(e))
         
-        # Test 3: Login with incorrect credentials
-        try:
-            wrong_login_data = {
-                "username": test_user["username"],
-                "password": "WrongPassword123!",
-                "stay_logged_in": False
-            }
-            response = requests.post(f"{self.base_url}/auth/login", json=wrong_login_data)
-            
-            if response.status_code == 401:
-                self.log_result("authentication", "Invalid Credentials Rejection", True)
-            else:
-                self.log_result("authentication", "Invalid Credentials Rejection", False, f"Expected 401, got: {response.status_code}")
-        except Exception as e:
-            self.log_result("authentication", "Invalid Credentials Rejection", False, str(e))
-        
-        # Test 4: Login with non-existent user
-        try:
-            nonexistent_login_data = {
-                "username": "nonexistent_user_12345",
-                "password": "SomePassword123!",
-                "stay_logged_in": False
-            }
-            response = requests.post(f"{self.base_url}/auth/login", json=nonexistent_login_data)
-            
-            if response.status_code == 401:
-                self.log_result("authentication", "Non-existent User Rejection", True)
-            else:
-                self.log_result("authentication", "Non-existent User Rejection", False, f"Expected 401, got: {response.status_code}")
-        except Exception as e:
-            self.log_result("authentication", "Non-existent User Rejection", False, str(e))
+        # Tests 3 and 4: Login with incorrect credentials or a non-existent user
+        rejected_logins = [
+            ("Invalid Credentials Rejection", test_user["username"], "WrongPassword123!"),
+            ("Non-existent User Rejection", "nonexistent_user_12345", "SomePassword123!")
+        ]
+        for test_name, username, password in rejected_logins:
+            try:
+                response = self.session.post(self.urls['login'], json={"username": username, "password": password, "stay_logged_in": False})
+                
+                if response.status_code == 401:
+                    self.log_result("authentication", test_name, True)
+                else:
+                    self.log_result("authentication", test_name, False, f"Expected 401, got: {response.status_code}")
+            except Exception as e:
+                self.log_result("authentication", test_name, False, str(e))
     
     def test_get_current_user(self):
         """Test get current user endpoint"""
-        print("\n👥 Testing Get Current User...")
+        self.log("\n👥 Testing Get Current User...")
         
-        if not self.user_tokens:
+        if not self.auth_headers:
             self.log_result("authentication", "Get User Test Setup", False, "No user tokens available")
             return
         
         test_user = self.test_users[0]
-        token = self.user_tokens.get(test_user["username"])
+        headers = self.auth_headers.get(test_user["username"])
         
-        if not token:
+        if not headers:
             self.log_result("authentication", "Get User Test Setup", False, "No token for test user")
             return
         
         # Test 1: Get user info with valid token
         try:
-            headers = {"Authorization": f"Bearer {token}"}
-            response = requests.get(f"{self.base_url}/auth/me", headers=headers)
+            response = self.session.get(self.urls['me'], headers=headers)
             
             if response.status_code == 200:
-                data = response.json()
-                required_fields = ['id', 'username', 'created_at']
+                data = parse_json(response)
+                missing_fields = USER_FIELDS - data.keys()
                 
-                if all(field in data for field in required_fields):
+                if not missing_fields:
                     if data['username'] == test_user["username"]:
                         self.log_result("authentication", "Get Current User Info", True)
                     else:
                         self.log_result("authentication", "Get Current User Info", False, "Username mismatch")
                 else:
-                    self.log_result("authentication", "Get Current User Info", False, "Missing required fields")
+                    self.log_result("authentication", "Get Current User Info", False, f"Missing required fields: {sorted(missing_fields)}")
             else:
                 self.log_result("authentication", "Get Current User Info", False, f"Status code: {response.status_code}")
         except Exception as e:
@@ -269,7 +383,7 @@ class NovusFilesTester:
         
         # Test 2: Get user info without token
         try:
-            response = requests.get(f"{self.base_url}/auth/me")
+            response = self.session.get(self.urls['me'])
             
             if response.status_code == 401:
                 self.log_result("security", "Unauthorized Access Prevention", True)
@@ -281,7 +395,7 @@ class NovusFilesTester:
         # Test 3: Get user info with invalid token
         try:
             headers = {"Authorization": "Bearer invalid_token_12345"}
-            response = requests.get(f"{self.base_url}/auth/me", headers=headers)
+            response = self.session.get(self.urls['me'], headers=headers)
             
             if response.status_code == 401:
                 self.log_result("security", "Invalid Token Rejection", True)
@@ -292,51 +406,52 @@ class NovusFilesTester:
     
     def test_protected_file_upload(self):
         """Test file upload with authentication"""
-        print("\n📤 Testing Protected File Upload...")
+        self.log("\n📤 Testing Protected File Upload...")
         
-        if not self.user_tokens or not self.test_users:
+        if not self.auth_headers or not self.test_users:
             self.log_result("private_files", "Upload Test Setup", False, "No authenticated users available")
             return
         
         test_user = self.test_users[0]
-        token = self.user_tokens.get(test_user["username"])
+        headers = self.auth_headers.get(test_user["username"])
         
-        if not token:
+        if not headers:
             self.log_result("private_files", "Upload Test Setup", False, "No token for test user")
             return
         
-        # Test 1: Upload file with valid authentication
-        test_file_path = self.create_test_file("private_document.txt", f"This is a private document for {test_user['username']}.\nOnly they should see this file.")
+        # Both upload scenarios are independent, so run them concurrently
+        self.run_concurrently(
+            lambda: self.upload_as_user(test_user, headers),
+            self.upload_without_auth
+        )
+    
+    def upload_as_user(self, test_user: Dict[str, Any], headers: Mapping[str, str]):
+        """Upload file with valid authentication"""
         try:
-            headers = {"Authorization": f"Bearer {token}"}
-            with open(test_file_path, 'rb') as f:
-                files = {'file': ('private_document.txt', f, 'text/plain')}
-                response = requests.post(f"{self.base_url}/upload", files=files, headers=headers)
+            payload = self.make_payload("private_document.txt", f"This is a private document for {test_user['username']}.\nOnly they should see this file.")
+            expected_digest = self.hash_upload(payload[1])
+            response = self.session.post(self.urls['upload'], files={'file': payload}, headers=headers)
             
             if response.status_code == 200:
-                data = response.json()
-                required_fields = ['id', 'original_filename', 'file_size', 'mime_type', 'upload_date', 'download_count', 'download_link']
+                data = parse_json(response)
+                missing_fields = UPLOAD_FIELDS - data.keys()
                 
-                if all(field in data for field in required_fields):
-                    if test_user["username"] not in self.uploaded_files:
-                        self.uploaded_files[test_user["username"]] = []
-                    self.uploaded_files[test_user["username"]].append(data)
+                if not missing_fields:
+                    self.uploaded_files.setdefault(test_user["username"], {})[data['id']] = data
+                    self.upload_digests[data['id']] = expected_digest
                     self.log_result("private_files", "Authenticated File Upload", True)
                 else:
-                    self.log_result("private_files", "Authenticated File Upload", False, "Missing required fields in response")
+                    self.log_result("private_files", "Authenticated File Upload", False, f"Missing required fields in response: {sorted(missing_fields)}")
             else:
                 self.log_result("private_files", "Authenticated File Upload", False, f"Status code: {response.status_code}, Response: {response.text}")
         except Exception as e:
             self.log_result("private_files", "Authenticated File Upload", False, str(e))
-        finally:
-            os.unlink(test_file_path)
-        
-        # Test 2: Upload file without authentication (should fail)
-        test_file_path = self.create_test_file("unauthorized_document.txt", "This upload should fail.")
+    
+    def upload_without_auth(self):
+        """Upload file without authentication (should fail)"""
         try:
-            with open(test_file_path, 'rb') as f:
-                files = {'file': ('unauthorized_document.txt', f, 'text/plain')}
-                response = requests.post(f"{self.base_url}/upload", files=files)
+            files = {'file': self.make_payload("unauthorized_document.txt", "This upload should fail.")}
+            response = self.session.post(self.urls['upload'], files=files)
             
             if response.status_code == 401:
                 self.log_result("security", "Upload Authentication Required", True)
@@ -344,67 +459,68 @@ class NovusFilesTester:
                 self.log_result("security", "Upload Authentication Required", False, f"Expected 401, got: {response.status_code}")
         except Exception as e:
             self.log_result("security", "Upload Authentication Required", False, str(e))
-        finally:
-            os.unlink(test_file_path)
+    
+    def bootstrap_user(self, prefix: str, password: str, label: str) -> Dict[str, Any]:
+        """Register and log in a helper user, returning it (or None if either step failed)"""
+        username = unique_username(prefix)
+        try:
+            response = self.session.post(self.urls['register'], json={"username": username, "password": password})
+            if response.status_code != 200:
+                self.log_result("user_isolation", f"{label} Registration", False, f"Registration failed: {response.status_code}")
+                return None
+            user = {"username": username, "password": password, "id": parse_json(response)['id']}
+            
+            login_data = {
+                "username": username,
+                "password": password,
+                "stay_logged_in": False
+            }
+            login_response = self.session.post(self.urls['login'], json=login_data)
+            if login_response.status_code != 200:
+                self.log_result("user_isolation", f"{label} Login", False, f"Login failed: {login_response.status_code}")
+                return None
+            token = parse_json(login_response)['access_token']
+        except Exception as e:
+            self.log_result("user_isolation", f"{label} Setup", False, str(e))
+            return None
+        
+        with self.results_lock:
+            self.test_users.append(user)
+            self.store_token(username, token)
+        return user
+    
+    def prepare_second_user(self):
+        """Set up the second isolation-test user; needs nothing from the first user's tests"""
+        self.second_user = self.bootstrap_user("testuser2", "SecurePassword456!", "Second User")
     
     def test_user_file_isolation(self):
         """Test that users can only see their own files"""
-        print("\n🔒 Testing User File Isolation...")
+        self.log("\n🔒 Testing User File Isolation...")
         
-        # Create a second test user
-        second_username = f"testuser2_{uuid.uuid4().hex[:8]}"
-        second_password = "SecurePassword456!"
+        if not self.second_user:
+            self.log_result("user_isolation", "User Isolation Test Setup", False, "No second user available")
+            return
         
+        second_username = self.second_user["username"]
         try:
-            registration_data = {
-                "username": second_username,
-                "password": second_password
-            }
-            response = requests.post(f"{self.base_url}/auth/register", json=registration_data)
+            # Upload a file as second user
+            headers = self.auth_headers[second_username]
+            payload = self.make_payload("second_user_file.txt", f"This file belongs to {second_username}")
+            expected_digest = self.hash_upload(payload[1])
+            upload_response = self.session.post(self.urls['upload'], files={'file': payload}, headers=headers)
             
-            if response.status_code == 200:
-                data = response.json()
-                second_user = {"username": second_username, "password": second_password, "id": data['id']}
-                self.test_users.append(second_user)
-                
-                # Login second user
-                login_data = {
-                    "username": second_username,
-                    "password": second_password,
-                    "stay_logged_in": False
-                }
-                login_response = requests.post(f"{self.base_url}/auth/login", json=login_data)
+            if upload_response.status_code == 200:
+                upload_data = parse_json(upload_response)
+                self.uploaded_files.setdefault(second_username, {})[upload_data['id']] = upload_data
+                self.upload_digests[upload_data['id']] = expected_digest
                 
-                if login_response.status_code == 200:
-                    login_data = login_response.json()
-                    second_token = login_data['access_token']
-                    self.user_tokens[second_username] = second_token
-                    
-                    # Upload a file as second user
-                    test_file_path = self.create_test_file("second_user_file.txt", f"This file belongs to {second_username}")
-                    try:
-                        headers = {"Authorization": f"Bearer {second_token}"}
-                        with open(test_file_path, 'rb') as f:
-                            files = {'file': ('second_user_file.txt', f, 'text/plain')}
-                            upload_response = requests.post(f"{self.base_url}/upload", files=files, headers=headers)
-                        
-                        if upload_response.status_code == 200:
-                            upload_data = upload_response.json()
-                            if second_username not in self.uploaded_files:
-                                self.uploaded_files[second_username] = []
-                            self.uploaded_files[second_username].append(upload_data)
-                            
-                            # Now test file isolation
-                            self.test_file_listing_isolation()
-                            self.test_file_deletion_isolation()
-                        else:
-                            self.log_result("user_isolation", "Second User File Upload", False, f"Upload failed: {upload_response.status_code}")
-                    finally:
-                        os.unlink(test_file_path)
-                else:
-                    self.log_result("user_isolation", "Second User Login", False, f"Login failed: {login_response.status_code}")
+                # Now test file isolation; the two checks are independent
+                self.run_concurrently(
+                    self.test_file_listing_isolation,
+                    self.test_file_deletion_isolation
+                )
             else:
-                self.log_result("user_isolation", "Second User Registration", False, f"Registration failed: {response.status_code}")
+                self.log_result("user_isolation", "Second User File Upload", False, f"Upload failed: {upload_response.status_code}")
         except Exception as e:
             self.log_result("user_isolation", "User Isolation Test Setup", False, str(e))
     
@@ -415,31 +531,26 @@ class NovusFilesTester:
         
         user1 = self.test_users[0]
         user2 = self.test_users[1]
-        token1 = self.user_tokens.get(user1["username"])
-        token2 = self.user_tokens.get(user2["username"])
+        headers1 = self.auth_headers.get(user1["username"])
+        headers2 = self.auth_headers.get(user2["username"])
         
-        if not token1 or not token2:
+        if not headers1 or not headers2:
             return
         
         try:
-            # Get file list for user 1
-            headers1 = {"Authorization": f"Bearer {token1}"}
-            response1 = requests.get(f"{self.base_url}/files", headers=headers1)
-            
-            # Get file list for user 2
-            headers2 = {"Authorization": f"Bearer {token2}"}
-            response2 = requests.get(f"{self.base_url}/files", headers=headers2)
+            # Get both users' file lists concurrently
+            response1, response2 = self.run_concurrently(
+                lambda: self.session.get(self.urls['files'], headers=headers1),
+                lambda: self.session.get(self.urls['files'], headers=headers2)
+            )
             
             if response1.status_code == 200 and response2.status_code == 200:
-                files1 = response1.json()
-                files2 = response2.json()
+                files1 = parse_json(response1)
+                files2 = parse_json(response2)
                 
                 # Check that user1 files are not in user2's list and vice versa
-                user1_files = self.uploaded_files.get(user1["username"], [])
-                user2_files = self.uploaded_files.get(user2["username"], [])
-                
-                user1_file_ids = {f['id'] for f in user1_files}
-                user2_file_ids = {f['id'] for f in user2_files}
+                user1_file_ids = self.uploaded_files.get(user1["username"], {}).keys()
+                user2_file_ids = self.uploaded_files.get(user2["username"], {}).keys()
                 
                 listed1_file_ids = {f['id'] for f in files1}
                 listed2_file_ids = {f['id'] for f in files2}
@@ -461,18 +572,17 @@ class NovusFilesTester:
         
         user1 = self.test_users[0]
         user2 = self.test_users[1]
-        token1 = self.user_tokens.get(user1["username"])
+        headers1 = self.auth_headers.get(user1["username"])
         
-        user2_files = self.uploaded_files.get(user2["username"], [])
+        user2_files = self.uploaded_files.get(user2["username"], {})
         
-        if not token1 or not user2_files:
+        if not headers1 or not user2_files:
             return
         
         try:
             # Try to delete user2's file using user1's token
-            user2_file_id = user2_files[0]['id']
-            headers1 = {"Authorization": f"Bearer {token1}"}
-            response = requests.delete(f"{self.base_url}/files/{user2_file_id}", headers=headers1)
+            user2_file_id = next(iter(user2_files))
+            response = self.session.delete(self.urls['file'].format(user2_file_id), headers=headers1)
             
             if response.status_code == 404:
                 self.log_result("user_isolation", "File Deletion Isolation", True)
@@ -483,36 +593,43 @@ class NovusFilesTester:
     
     def test_public_download_links(self):
         """Test that download links still work publicly (no auth required)"""
-        print("\n🌐 Testing Public Download Links...")
+        self.log("\n🌐 Testing Public Download Links...")
         
         if not self.uploaded_files:
             self.log_result("private_files", "Public Download Test Setup", False, "No uploaded files to test")
             return
         
         # Get a file from any user
-        for username, files in self.uploaded_files.items():
+        for username, files in list(self.uploaded_files.items()):
             if files:
-                file_info = files[0]
-                download_token = file_info['download_link'].split('/')[-1]
+                file_info = next(iter(files.values()))
+                download_token = get_download_token(file_info['download_link'])
                 
                 try:
-                    # Download without authentication
-                    response = requests.get(f"{self.base_url}/download/{download_token}")
-                    
-                    if response.status_code == 200:
-                        if len(response.content) > 0:
-                            self.log_result("private_files", "Public Download Links", True)
+                    # Download without authentication, hashing the stream instead of buffering the body
+                    with self.session.get(self.urls['download'].format(download_token), stream=True) as response:
+                        if response.status_code == 200:
+                            digest = hashlib.sha256()
+                            downloaded_size = 0
+                            for chunk in response.iter_content(CHUNK_SIZE):
+                                digest.update(chunk)
+                                downloaded_size += len(chunk)
+                            
+                            if downloaded_size == 0:
+                                self.log_result("private_files", "Public Download Links", False, "Empty file content")
+                            elif digest.hexdigest() != self.upload_digests.get(file_info['id']):
+                                self.log_result("private_files", "Public Download Links", False, "Downloaded content does not match the uploaded file")
+                            else:
+                                self.log_result("private_files", "Public Download Links", True)
                         else:
-                            self.log_result("private_files", "Public Download Links", False, "Empty file content")
-                    else:
-                        self.log_result("private_files", "Public Download Links", False, f"Status code: {response.status_code}")
+                            self.log_result("private_files", "Public Download Links", False, f"Status code: {response.status_code}")
                 except Exception as e:
                     self.log_result("private_files", "Public Download Links", False, str(e))
                 break
     
     def test_password_security(self):
         """Test password hashing and security"""
-        print("\n🔐 Testing Password Security...")
+        self.log("\n🔐 Testing Password Security...")
         
         # This is implicit - we can't directly test password hashing without database access
         # But we can test that login works with correct password and fails with wrong password
@@ -527,21 +644,33 @@ class NovusFilesTester:
         """Clean up test files and users"""
         print("\n🧹 Cleaning up test data...")
         
-        # Clean up files for each user
+        # Collect every file to delete, along with its owner's auth headers
+        deletions = []
         for username, files in self.uploaded_files.items():
-            token = self.user_tokens.get(username)
-            if token:
-                headers = {"Authorization": f"Bearer {token}"}
-                for file_info in files[:]:
-                    try:
-                        response = requests.delete(f"{self.base_url}/files/{file_info['id']}", headers=headers)
-                        if response.status_code == 200:
-                            print(f"✅ Cleaned up file: {file_info['original_filename']} for {username}")
-                            files.remove(file_info)
-                        else:
-                            print(f"⚠️ Failed to cleanup file: {file_info['original_filename']} for {username}")
-                    except Exception as e:
-                        print(f"⚠️ Cleanup error for {file_info['original_filename']}: {e}")
+            headers = self.auth_headers.get(username)
+            if headers:
+                deletions.extend((username, files, file_info, headers) for file_info in files.values())
+        
+        def delete(deletion):
+            username, files, file_info, headers = deletion
+            try:
+                return self.session.delete(self.urls['file'].format(file_info['id']), headers=headers)
+            except Exception as e:
+                return e
+        
+        # Issue the deletes in parallel, then report in order
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+            results = list(executor.map(delete, deletions))
+        for (username, files, file_info, _), result in zip(deletions, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ Cleanup error for {file_info['original_filename']}: {result}")
+            elif result.status_code == 200:
+                print(f"✅ Cleaned up file: {file_info['original_filename']} for {username}")
+                files.pop(file_info['id'], None)
+            else:
+                print(f"⚠️ Failed to cleanup file: {file_info['original_filename']} for {username}")
+        
+        self.session.close()
     
     def print_summary(self):
         """Print test results summary"""
@@ -552,18 +681,17 @@ class NovusFilesTester:
         total_passed = 0
         total_failed = 0
         
-        for category, results in self.test_results.items():
-            passed = results["passed"]
-            failed = results["failed"]
+        for category in RESULT_CATEGORIES:
+            passed = self.result_counts[(category, "passed")]
+            failed = self.result_counts[(category, "failed")]
             total_passed += passed
             total_failed += failed
             
             status = "✅ PASS" if failed == 0 else "❌ FAIL"
             print(f"{category.upper().replace('_', ' ')}: {status} ({passed} passed, {failed} failed)")
             
-            if results["errors"]:
-                for error in results["errors"]:
-                    print(f"  ❌ {error}")
+            for test_name, error_msg in self.result_errors.get(category, ()):
+                print(f"  ❌ {test_name}: {error_msg}")
         
         print("-" * 70)
         overall_status = "✅ ALL TESTS PASSED" if total_failed == 0 else f"❌ {total_failed} TESTS FAILED"
@@ -580,15 +708,23 @@ def main():
     tester = NovusFilesTester()
     
     try:
-        # Run all tests in order
-        tester.test_api_root()
-        tester.test_user_registration()
-        tester.test_user_login()
-        tester.test_get_current_user()
-        tester.test_protected_file_upload()
-        tester.test_user_file_isolation()
-        tester.test_public_download_links()
-        tester.test_password_security()
+        # Fail fast if the backend is unreachable instead of timing out in every test
+        api_available = tester.test_api_root()
+        tester.flush_log()
+        if not api_available:
+            return tester.print_summary()
+        
+        # Start each test as soon as the ones it depends on are done
+        tester.run_dependency_graph({
+            "register": tester.test_user_registration,
+            "login": tester.test_user_login,
+            "me": tester.test_get_current_user,
+            "upload": tester.test_protected_file_upload,
+            "password": tester.test_password_security,
+            "second_user": tester.prepare_second_user,
+            "isolation": tester.test_user_file_isolation,
+            "download": tester.test_public_download_links
+        }, TEST_DEPENDENCIES)
         
         # Print summary
         all_passed = tester.print_summary()
@@ -603,6 +739,7 @@ def main():
         return False
     finally:
         # Always try to cleanup
+        tester.flush_log()
         tester.cleanup_test_data()
 
 if __name__ == "__main__":
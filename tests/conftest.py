@@ -0,0 +1,134 @@
+"""
+Shared fixtures for the NovusFiles backend API tests.
+
+Each pytest-xdist worker registers its own users, so the suite can be sharded:
+    pytest -n auto tests/
+"""
+
+import os
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend_test import BACKEND_URL, MAX_CONCURRENT_REQUESTS, build_urls, create_session, parse_json, unique_username
+
+URLS = build_urls(BACKEND_URL)
+WORKER_ID = os.environ.get("PYTEST_XDIST_WORKER", "main")
+TEST_PASSWORD = "SecurePassword123!"
+
+
+def register_user(session, prefix: str) -> dict:
+    """Register a new user, returning its credentials and the registration response"""
+    username = unique_username(f"{prefix}_{WORKER_ID}")
+    response = session.post(URLS['register'], json={"username": username, "password": TEST_PASSWORD})
+    assert response.status_code == 200, f"Registration failed: {response.status_code}, {response.text}"
+    return {"username": username, "password": TEST_PASSWORD, "response": parse_json(response)}
+
+
+def login_user(session, user: dict, stay_logged_in: bool = False) -> dict:
+    """Log a user in and return the token response"""
+    response = session.post(URLS['login'], json={
+        "username": user["username"],
+        "password": user["password"],
+        "stay_logged_in": stay_logged_in
+    })
+    assert response.status_code == 200, f"Login failed: {response.status_code}, {response.text}"
+    return parse_json(response)
+
+
+@pytest.fixture(scope="session")
+def urls():
+    return URLS
+
+
+@pytest.fixture(scope="session")
+def session():
+    http = create_session()
+    yield http
+    http.close()
+
+
+@pytest.fixture(scope="session")
+def api_root_payload(session):
+    """GET / once per session; the payload never changes"""
+    response = session.get(URLS['root'])
+    assert response.status_code == 200, f"API root unavailable: {response.status_code}"
+    return parse_json(response)
+
+
+@pytest.fixture(scope="session")
+def uploaded_files(session):
+    """Files uploaded during the session as (headers, file info); deleted at teardown"""
+    files = []
+    yield files
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+        list(executor.map(lambda upload: session.delete(URLS['file'].format(upload[1]['id']), headers=upload[0]), files))
+
+
+def bootstrap_user(session, prefix: str) -> dict:
+    """Register and log in a new user, keeping the short-term login response and its Authorization headers"""
+    user = register_user(session, prefix)
+    user["login"] = login_user(session, user)
+    user["headers"] = types.MappingProxyType({"Authorization": f"Bearer {user['login']['access_token']}"})
+    return user
+
+
+@pytest.fixture(scope="session")
+def bootstrapped_users(session):
+    """Both test users, registered and logged in concurrently"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        return list(executor.map(lambda prefix: bootstrap_user(session, prefix), ("testuser", "testuser2")))
+
+
+@pytest.fixture(scope="session")
+def registered_user(bootstrapped_users):
+    return bootstrapped_users[0]
+
+
+@pytest.fixture(scope="session")
+def login_response(registered_user):
+    """Short-term login response for the registered user, obtained once per session"""
+    return registered_user["login"]
+
+
+@pytest.fixture(scope="session")
+def auth_headers(registered_user):
+    return registered_user["headers"]
+
+
+@pytest.fixture(scope="session")
+def current_user(session, auth_headers):
+    """GET /auth/me once per session for the registered user"""
+    response = session.get(URLS['me'], headers=auth_headers)
+    assert response.status_code == 200, f"Get current user failed: {response.status_code}, {response.text}"
+    return parse_json(response)
+
+
+@pytest.fixture(scope="session")
+def second_user_headers(bootstrapped_users):
+    return bootstrapped_users[1]["headers"]
+
+
+def upload(session, uploaded_files, headers: dict, filename: str, content: bytes) -> dict:
+    """Upload a text file and track it for cleanup"""
+    response = session.post(URLS['upload'], files={'file': (filename, content, 'text/plain')}, headers=headers)
+    assert response.status_code == 200, f"Upload failed: {response.status_code}, {response.text}"
+    file_info = parse_json(response)
+    uploaded_files.append((headers, file_info))
+    return file_info
+
+
+@pytest.fixture(scope="session")
+def private_document(registered_user):
+    return f"This is a private document for {registered_user['username']}.\nOnly they should see this file.".encode()
+
+
+@pytest.fixture(scope="session")
+def uploaded_file(session, uploaded_files, auth_headers, private_document):
+    return upload(session, uploaded_files, auth_headers, "private_document.txt", private_document)
+
+
+@pytest.fixture(scope="session")
+def second_user_file(session, uploaded_files, second_user_headers):
+    return upload(session, uploaded_files, second_user_headers, "second_user_file.txt", b"This file belongs to the second user")
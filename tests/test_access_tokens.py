@@ -0,0 +1,94 @@
+"""
+Unit tests for the backend's HS256 access-token verification; no running backend needed.
+"""
+
+import base64
+import os
+from datetime import timedelta
+
+import jwt
+import pytest
+
+# server.py connects lazily, so any URL lets it import
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "novusfiles_test")
+
+from backend.server import ALGORITHM, SECRET_KEY, create_access_token, decode_access_token  # noqa: E402
+
+
+def b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def test_decodes_token_from_create_access_token():
+    token = create_access_token({"sub": "user-1"}, expires_delta=timedelta(minutes=5))
+    payload = decode_access_token(token)
+    assert payload["sub"] == "user-1"
+    assert isinstance(payload["exp"], int)
+
+
+def test_matches_pyjwt_decode():
+    token = create_access_token({"sub": "user-1"}, expires_delta=timedelta(minutes=5))
+    assert decode_access_token(token) == jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+def test_rejects_tampered_signature():
+    token = create_access_token({"sub": "user-1"}, expires_delta=timedelta(minutes=5))
+    signing_input, _, signature = token.rpartition(".")
+    tampered = signing_input + "." + ("A" if signature[0] != "A" else "B") + signature[1:]
+    with pytest.raises(jwt.InvalidSignatureError):
+        decode_access_token(tampered)
+
+
+def test_rejects_tampered_payload():
+    token = create_access_token({"sub": "user-1"}, expires_delta=timedelta(minutes=5))
+    header, _, signature = token.split(".")
+    payload = b64url(b'{"sub":"admin","exp":9999999999}')
+    with pytest.raises(jwt.InvalidSignatureError):
+        decode_access_token(f"{header}.{payload}.{signature}")
+
+
+def test_rejects_token_signed_with_another_key():
+    token = jwt.encode({"sub": "user-1"}, "some-other-key-of-at-least-32-bytes", algorithm=ALGORITHM)
+    with pytest.raises(jwt.InvalidSignatureError):
+        decode_access_token(token)
+
+
+@pytest.mark.parametrize("algorithm", ["HS384", "HS512"])
+def test_rejects_other_algorithms(algorithm):
+    token = jwt.encode({"sub": "user-1"}, SECRET_KEY, algorithm=algorithm)
+    with pytest.raises(jwt.InvalidAlgorithmError):
+        decode_access_token(token)
+
+
+def test_rejects_unsigned_token():
+    token = b64url(b'{"alg":"none","typ":"JWT"}') + "." + b64url(b'{"sub":"user-1"}') + "."
+    with pytest.raises(jwt.InvalidAlgorithmError):
+        decode_access_token(token)
+
+
+def test_rejects_expired_token():
+    token = create_access_token({"sub": "user-1"}, expires_delta=timedelta(seconds=-1))
+    with pytest.raises(jwt.ExpiredSignatureError):
+        decode_access_token(token)
+
+
+def test_rejects_non_integer_exp():
+    token = jwt.encode({"sub": "user-1", "exp": "tomorrow"}, SECRET_KEY, algorithm=ALGORITHM)
+    with pytest.raises(jwt.DecodeError):
+        decode_access_token(token)
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "x",
+    "a.b",
+    "a.b.c.d",
+    "é.é.é",
+    "!!!.@@@.###",
+    b64url(b"[]") + "." + b64url(b"[]") + ".",
+    b64url(b'{"alg":"HS256"}') + "." + b64url(b"not json") + ".",
+])
+def test_rejects_malformed_tokens(token):
+    with pytest.raises(jwt.PyJWTError):
+        decode_access_token(token)
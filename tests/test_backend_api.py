@@ -0,0 +1,135 @@
+"""
+NovusFiles backend API tests: authentication, private files and user isolation.
+"""
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend_test import CHUNK_SIZE, TOKEN_FIELDS, UPLOAD_FIELDS, USER_FIELDS, get_download_token, parse_json
+
+
+def test_api_root(api_root_payload):
+    assert "NovusFiles" in api_root_payload.get("message", "")
+
+
+def test_user_registration(registered_user):
+    data = registered_user["response"]
+    assert not USER_FIELDS - data.keys()
+    assert data['username'] == registered_user["username"]
+
+
+def test_duplicate_username_rejected(session, urls, registered_user):
+    response = session.post(urls['register'], json={"username": registered_user["username"], "password": "AnotherPassword123!"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("payload", [
+    {"username": "", "password": "short"},
+    {"username": "missing_password"},
+])
+def test_registration_input_validation(session, urls, payload):
+    response = session.post(urls['register'], json=payload)
+    assert response.status_code in (400, 422)
+
+
+def assert_token_response(data: dict, expires_in: int):
+    assert not TOKEN_FIELDS - data.keys()
+    assert data['token_type'] == 'bearer'
+    assert data['expires_in'] == expires_in
+
+
+def test_login_short_term_token(login_response):
+    assert_token_response(login_response, 30 * 60)
+
+
+def test_login_long_term_token(session, urls, registered_user):
+    response = session.post(urls['login'], json={
+        "username": registered_user["username"],
+        "password": registered_user["password"],
+        "stay_logged_in": True
+    })
+    assert response.status_code == 200
+    assert_token_response(parse_json(response), 30 * 24 * 60 * 60)
+
+
+@pytest.mark.parametrize("username, password", [
+    (None, "WrongPassword123!"),  # the registered user
+    ("nonexistent_user_12345", "SomePassword123!"),
+], ids=["wrong_password", "nonexistent_user"])
+def test_invalid_login_rejected(session, urls, registered_user, username, password):
+    response = session.post(urls['login'], json={"username": username or registered_user["username"], "password": password})
+    assert response.status_code == 401
+
+
+def test_get_current_user(registered_user, current_user):
+    assert not USER_FIELDS - current_user.keys()
+    assert current_user['username'] == registered_user["username"]
+    assert current_user['id'] == registered_user["response"]['id']
+
+
+@pytest.mark.parametrize("headers", [{}, {"Authorization": "Bearer invalid_token_12345"}])
+def test_get_current_user_requires_valid_token(session, urls, headers):
+    response = session.get(urls['me'], headers=headers)
+    assert response.status_code == 401
+
+
+def test_protected_file_upload(uploaded_file):
+    assert not UPLOAD_FIELDS - uploaded_file.keys()
+
+
+def test_upload_requires_auth(session, urls):
+    files = {'file': ('unauthorized_document.txt', b"This upload should fail.", 'text/plain')}
+    response = session.post(urls['upload'], files=files)
+    assert response.status_code == 401
+
+
+def test_file_listing_isolation(session, urls, auth_headers, second_user_headers, uploaded_file, second_user_file):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        response1, response2 = executor.map(
+            lambda headers: session.get(urls['files'], headers=headers),
+            (auth_headers, second_user_headers)
+        )
+    assert response1.status_code == 200 and response2.status_code == 200
+    listed1 = {f['id'] for f in parse_json(response1)}
+    listed2 = {f['id'] for f in parse_json(response2)}
+    assert uploaded_file['id'] in listed1 and uploaded_file['id'] not in listed2
+    assert second_user_file['id'] in listed2 and second_user_file['id'] not in listed1
+
+
+def test_file_deletion_isolation(session, urls, auth_headers, second_user_file):
+    response = session.delete(urls['file'].format(second_user_file['id']), headers=auth_headers)
+    assert response.status_code == 404
+
+
+def test_public_download_links(session, urls, uploaded_file, private_document):
+    download_url = urls['download'].format(get_download_token(uploaded_file['download_link']))
+    with session.get(download_url, stream=True) as response:
+        assert response.status_code == 200
+        digest = hashlib.sha256()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            digest.update(chunk)
+    assert digest.hexdigest() == hashlib.sha256(private_document).hexdigest()
+
+
+def test_deleting_one_copy_keeps_shared_content(session, urls, registered_user, auth_headers, uploaded_files):
+    # Identical uploads share one stored file, which must outlive all but the last record
+    content = f"Shared content for {registered_user['username']}".encode()
+    copies = []
+    for filename in ("shared_copy_1.txt", "shared_copy_2.txt"):
+        response = session.post(urls['upload'], files={'file': (filename, content, 'text/plain')}, headers=auth_headers)
+        assert response.status_code == 200
+        copies.append(parse_json(response))
+    uploaded_files.append((auth_headers, copies[1]))
+
+    response = session.delete(urls['file'].format(copies[0]['id']), headers=auth_headers)
+    assert response.status_code == 200
+
+    download_url = urls['download'].format(get_download_token(copies[1]['download_link']))
+    with session.get(download_url, stream=True) as response:
+        assert response.status_code == 200
+        digest = hashlib.sha256()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            digest.update(chunk)
+    assert digest.hexdigest() == hashlib.sha256(content).hexdigest()